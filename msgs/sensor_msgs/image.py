@@ -1,5 +1,6 @@
 import base64
 import json
+from concurrent.futures import Future
 from typing import Optional
 from pathlib import Path
 from typing import Protocol
@@ -8,15 +9,19 @@ import numpy as np
 import cv2
 
 class Subscriber(Protocol):
-    def receive_binary(self) -> bytes:
+    def receive_binary(self, topic: Optional[str] = None) -> bytes:
         ...
     def send(self, message: dict) -> None:
         ...
 
 class Image:
-    def __init__(self, subscriber: Subscriber, topic: str = "/camera/image_raw"):
+    def __init__(self, subscriber: Subscriber, topic: str = "/camera/image_raw",
+                 worker_pool=None, worker_timeout: float = 10.0):
         self.subscriber = subscriber
         self.topic = topic
+        # ImageWorkerPool を渡すと圧縮処理を別プロセスで実行する（None なら同一プロセス）
+        self.worker_pool = worker_pool
+        self.worker_timeout = worker_timeout
 
     def subscribe(self, save_path: Optional[str] = None) -> Optional[bytes]:
         try:
@@ -27,7 +32,7 @@ class Image:
             }
             self.subscriber.send(subscribe_msg)
 
-            raw = self.subscriber.receive_binary()
+            raw = self.subscriber.receive_binary(self.topic)
             if not raw:
                 print("[Image] No data received from subscriber")
                 return None
@@ -79,8 +84,14 @@ class Image:
 
     def subscribe_as_base64(self, max_size_kb: int = 800, quality: int = 85) -> Optional[dict]:
         """画像をBase64形式で取得（サイズ制限付き）"""
-        import base64
-        
+        return self.wait_base64(self.submit_as_base64(max_size_kb, quality))
+
+    def submit_as_base64(self, max_size_kb: int = 800, quality: int = 85) -> Optional[Future]:
+        """画像を受信して圧縮を依頼し、結果の Future を返す
+
+        ワーカープールがあれば圧縮は別プロセスで進むので、複数カメラの画像を
+        先にすべて submit してから wait_base64() で待つと並列に圧縮できる。
+        """
         try:
             subscribe_msg = {
                 "op": "subscribe",
@@ -89,7 +100,7 @@ class Image:
             }
             self.subscriber.send(subscribe_msg)
 
-            raw = self.subscriber.receive_binary()
+            raw = self.subscriber.receive_binary(self.topic)
             if not raw:
                 print("[Image] No data received from subscriber")
                 return None
@@ -122,10 +133,8 @@ class Image:
                 print(f"[Image] Unsupported encoding: {encoding}")
                 return None
 
-            # 画像を圧縮
-            compressed_base64 = self._compress_image_to_base64(
-                img_cv, max_size_kb, quality
-            )
+            # 画像の圧縮を依頼
+            future = self._submit_compression(img_cv, max_size_kb, quality)
             
             # Unsubscribe
             unsubscribe_msg = {
@@ -134,55 +143,80 @@ class Image:
             }
             self.subscriber.send(unsubscribe_msg)
             
-            return compressed_base64
+            return future
 
         except Exception as e:
             print(f"[Image] Failed to receive or decode: {e}")
             return None
 
-    def _compress_image_to_base64(self, img, max_size_kb: int, initial_quality: int) -> dict:
-        """画像を指定サイズ以下に圧縮してBase64エンコード"""
-        import base64
-        
-        original_height, original_width = img.shape[:2]
+    def wait_base64(self, future: Optional[Future]) -> Optional[dict]:
+        """submit_as_base64() の結果を待つ。タイムアウト時は依頼を取り消す"""
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=self.worker_timeout)
+        except Exception as e:
+            future.cancel()
+            print(f"[Image] Failed to compress: {e!r}")
+            return None
+
+    def _submit_compression(self, img, max_size_kb: int, initial_quality: int) -> Future:
+        """画像の圧縮を依頼する（ワーカープールがなければその場で圧縮）"""
+        if self.worker_pool is None:
+            future = Future()
+            future.set_result(compress_image_to_base64(img, max_size_kb, initial_quality))
+            return future
+
+        # ワーカープロセスで圧縮（フレームは共有メモリ経由で受け渡し）
+        return self.worker_pool.submit(
+            compress_image_to_base64, img, max_size_kb, initial_quality
+        )
+
+
+def compress_image_to_base64(img, max_size_kb: int, initial_quality: int) -> Optional[dict]:
+    """画像を指定サイズ以下に圧縮してBase64エンコード
+
+    ワーカープロセスからも呼び出せるようにモジュールレベルで定義している。
+    """
+    original_height, original_width = img.shape[:2]
+    
+    # 段階的に圧縮を試みる
+    widths = [original_width, 1280, 960, 640, 480, 320]
+    qualities = [initial_quality, 70, 50, 30]
+    
+    for target_width in widths:
+        if target_width > original_width:
+            continue
+            
+        # リサイズ
+        scale = target_width / original_width
+        new_width = int(original_width * scale)
+        new_height = int(original_height * scale)
         
-        # 段階的に圧縮を試みる
-        widths = [original_width, 1280, 960, 640, 480, 320]
-        qualities = [initial_quality, 70, 50, 30]
+        if scale < 1:
+            resized_img = cv2.resize(img, (new_width, new_height), 
+                                    interpolation=cv2.INTER_AREA)
+        else:
+            resized_img = img
         
-        for target_width in widths:
-            if target_width > original_width:
-                continue
-                
-            # リサイズ
-            scale = target_width / original_width
-            new_width = int(original_width * scale)
-            new_height = int(original_height * scale)
+        for quality in qualities:
+            # JPEG圧縮
+            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+            _, buffer = cv2.imencode('.jpg', resized_img, encode_param)
+            img_base64 = base64.b64encode(buffer).decode('utf-8')
             
-            if scale < 1:
-                resized_img = cv2.resize(img, (new_width, new_height), 
-                                        interpolation=cv2.INTER_AREA)
-            else:
-                resized_img = img
+            # サイズチェック
+            size_kb = len(img_base64) / 1024
             
-            for quality in qualities:
-                # JPEG圧縮
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-                _, buffer = cv2.imencode('.jpg', resized_img, encode_param)
-                img_base64 = base64.b64encode(buffer).decode('utf-8')
-                
-                # サイズチェック
-                size_kb = len(img_base64) / 1024
-                
-                if size_kb <= max_size_kb:
-                    return {
-                        "image_base64": img_base64,
-                        "mime_type": "image/jpeg",
-                        "original_size": f"{original_width}x{original_height}",
-                        "compressed_size": f"{new_width}x{new_height}",
-                        "quality": quality,
-                        "size_kb": round(size_kb, 2)
-                    }
-        
-        # 最小サイズでも大きすぎる場合
-        return None
+            if size_kb <= max_size_kb:
+                return {
+                    "image_base64": img_base64,
+                    "mime_type": "image/jpeg",
+                    "original_size": f"{original_width}x{original_height}",
+                    "compressed_size": f"{new_width}x{new_height}",
+                    "quality": quality,
+                    "size_kb": round(size_kb, 2)
+                }
+    
+    # 最小サイズでも大きすぎる場合
+    return None
@@ -30,7 +30,7 @@ class JointState:
             "topic": self.topic
         }
         self.publisher.send(subscribe_msg)
-        raw = self.publisher.receive_binary()
+        raw = self.publisher.receive_binary(self.topic)
         if not raw:
             return None
         import json
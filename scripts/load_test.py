@@ -0,0 +1,152 @@
+"""共有サーバーモード（SSE）の負荷試験
+
+モックrosbridgeと server.py（MCP_TRANSPORT=sse）を起動し、
+1 / 10 / 50 の同時クライアントからツールを呼び出してレイテンシを計測する。
+
+    uv run scripts/load_test.py
+    uv run scripts/load_test.py --clients 1 10 50 --calls 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+from mock_rosbridge import MockRosbridge
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# (ツール名, 引数)
+TOOL_CALLS = [
+    ("get_topics", {}),
+    ("get_camera_image_base64", {"camera_type": "front", "max_size_kb": 200}),
+    ("pub_twist", {"linear": [0.1, 0, 0], "angular": [0, 0, 0.1]}),
+]
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server did not start on {host}:{port}")
+
+
+async def run_client(url: str, calls: int, latencies: dict,
+                     on_ready: Callable[[], None], start: asyncio.Event):
+    async with sse_client(url) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            on_ready()
+            await start.wait()
+            for i in range(calls):
+                name, arguments = TOOL_CALLS[i % len(TOOL_CALLS)]
+                started = time.perf_counter()
+                result = await session.call_tool(name, arguments)
+                elapsed = (time.perf_counter() - started) * 1000
+                key = name if not result.isError else f"{name} (error)"
+                latencies.setdefault(key, []).append(elapsed)
+
+
+async def run_round(url: str, num_clients: int, calls: int) -> tuple[dict, float]:
+    latencies = {}
+    ready_count = 0
+    all_ready = asyncio.Event()
+    start = asyncio.Event()
+
+    def on_ready():
+        nonlocal ready_count
+        ready_count += 1
+        if ready_count == num_clients:
+            all_ready.set()
+
+    tasks = [
+        asyncio.create_task(run_client(url, calls, latencies, on_ready, start))
+        for _ in range(num_clients)
+    ]
+    # 全クライアントの接続・初期化が終わってから一斉に呼び出す（ハンドシェイクは計測に含めない）
+    ready_waiter = asyncio.create_task(all_ready.wait())
+    await asyncio.wait([ready_waiter, *tasks], return_when=asyncio.FIRST_COMPLETED)
+    if not all_ready.is_set():
+        # 初期化前に終了したクライアントがいる。その例外を表に出す
+        ready_waiter.cancel()
+        await asyncio.gather(*tasks)
+        raise RuntimeError("A client exited before the round started")
+
+    started = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - started
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    index = min(int(round(q * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def print_round(num_clients: int, latencies: dict, wall_time: float):
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n== {num_clients} concurrent client(s): {total} calls in {wall_time:.2f}s "
+          f"({total / wall_time:.1f} calls/s)")
+    print(f"{'tool':<32}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, values in sorted(latencies.items()):
+        print(f"{name:<32}{len(values):>7}{statistics.median(values):>10.1f}"
+              f"{percentile(values, 0.95):>10.1f}{max(values):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the shared SSE server mode")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--calls", type=int, default=15, help="tool calls per client")
+    parser.add_argument("--mcp-port", type=int, default=8765)
+    parser.add_argument("--rosbridge-port", type=int, default=9876)
+    parser.add_argument("--image-workers", type=int, default=0)
+    args = parser.parse_args()
+
+    rosbridge = MockRosbridge(port=args.rosbridge_port)
+    rosbridge.start()
+
+    env = dict(
+        os.environ,
+        MCP_TRANSPORT="sse",
+        MCP_HOST="127.0.0.1",
+        MCP_PORT=str(args.mcp_port),
+        ROSBRIDGE_IP="127.0.0.1",
+        ROSBRIDGE_PORT=str(args.rosbridge_port),
+        IMAGE_WORKER_PROCESSES=str(args.image_workers),
+    )
+    server = subprocess.Popen(
+        [sys.executable, str(ROOT_DIR / "server.py")],
+        cwd=ROOT_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port("127.0.0.1", args.mcp_port)
+        url = f"http://127.0.0.1:{args.mcp_port}/sse"
+        for num_clients in args.clients:
+            latencies, wall_time = asyncio.run(run_round(url, num_clients, args.calls))
+            print_round(num_clients, latencies, wall_time)
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        rosbridge.shutdown()
+        rosbridge.server_close()
+
+
+if __name__ == "__main__":
+    main()
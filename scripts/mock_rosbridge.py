@@ -0,0 +1,267 @@
+"""負荷試験用の簡易rosbridgeモック（標準ライブラリのみ）
+
+subscribe されたトピックに一定周期でメッセージを publish し、
+/rosapi/topics の call_service に応答する。publish された値は読み捨てる。
+latched トピックは実際の rosbridge と同様に subscribe 時に一度だけ送る。
+
+    python scripts/mock_rosbridge.py --port 9090
+"""
+import argparse
+import base64
+import hashlib
+import json
+import socketserver
+import struct
+import threading
+import time
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+TOPICS = [
+    ("/kachaka/front_camera/image_raw", "sensor_msgs/Image"),
+    ("/kachaka/back_camera/image_raw", "sensor_msgs/Image"),
+    ("/kachaka/joint_states", "sensor_msgs/JointState"),
+    ("/kachaka/manual_control/cmd_vel", "geometry_msgs/Twist"),
+    ("/kachaka/layout/locations/list", "kachaka_interfaces/LocationList"),
+]
+
+
+def make_image_msg(width: int, height: int) -> dict:
+    # グラデーション画像（rgb8）。ランダム値よりJPEG圧縮の結果が実画像に近い
+    row = bytes((x * 255 // max(width - 1, 1)) for x in range(width) for _ in range(3))
+    data = b"".join(
+        bytes((v + y) % 256 for v in row) for y in range(height)
+    )
+    return {
+        "header": {"frame_id": "camera"},
+        "height": height,
+        "width": width,
+        "encoding": "rgb8",
+        "is_bigendian": 0,
+        "step": width * 3,
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def make_locations_msg() -> dict:
+    return {
+        "locations": [
+            {"id": "L01", "name": "Kitchen", "type": 0, "pose": {"x": 1.0, "y": 2.0, "theta": 0.0}},
+        ],
+        "default_location_id": "L01",
+    }
+
+
+def make_jointstate_msg() -> dict:
+    return {
+        "header": {},
+        "name": ["joint1", "joint2"],
+        "position": [0.0, 0.0],
+        "velocity": [0.0, 0.0],
+        "effort": [0.0, 0.0],
+    }
+
+
+class RosbridgeHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.send_lock = threading.Lock()
+        self.subscriptions = {}  # topic -> throttle_rate (秒)
+        self.subs_lock = threading.Lock()
+        self.closed = threading.Event()
+
+    def handle(self):
+        if not self._handshake():
+            return
+
+        publisher = threading.Thread(target=self._publish_loop, daemon=True)
+        publisher.start()
+        try:
+            while not self.closed.is_set():
+                frame = self._recv_frame()
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == 0x8:  # close
+                    self._send_frame(0x8, payload[:2])
+                    break
+                if opcode == 0x9:  # ping
+                    self._send_frame(0xA, payload)
+                    continue
+                if opcode == 0x1:
+                    self._on_message(json.loads(payload.decode("utf-8")))
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            self.closed.set()
+
+    def _handshake(self) -> bool:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+
+        key = None
+        for line in request.decode("latin-1").split("\r\n"):
+            if line.lower().startswith("sec-websocket-key:"):
+                key = line.split(":", 1)[1].strip()
+        if key is None:
+            return False
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.request.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+    def _recv_exact(self, size: int) -> bytes:
+        buf = b""
+        while len(buf) < size:
+            chunk = self.request.recv(size - len(buf))
+            if not chunk:
+                raise ConnectionError("connection closed")
+            buf += chunk
+        return buf
+
+    def _recv_frame(self):
+        try:
+            b0, b1 = self._recv_exact(2)
+        except ConnectionError:
+            return None
+        opcode = b0 & 0x0F
+        length = b1 & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._recv_exact(8))[0]
+        mask = self._recv_exact(4) if b1 & 0x80 else None
+        payload = self._recv_exact(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        with self.send_lock:
+            self.request.sendall(header + payload)
+
+    def _send_json(self, message: dict):
+        self._send_frame(0x1, json.dumps(message).encode("utf-8"))
+
+    def _on_message(self, message: dict):
+        op = message.get("op")
+        if op == "subscribe":
+            topic = message["topic"]
+            latched = self.server.latched_payloads.get(topic)
+            if latched is not None:
+                self._send_frame(0x1, latched)
+                return
+            with self.subs_lock:
+                self.subscriptions[topic] = message.get("throttle_rate", 0) / 1000.0
+        elif op == "unsubscribe":
+            with self.subs_lock:
+                self.subscriptions.pop(message.get("topic"), None)
+        elif op == "call_service":
+            time.sleep(self.server.service_latency)
+            values = {}
+            if message.get("service") == "/rosapi/topics":
+                topics, types = zip(*TOPICS)
+                values = {"topics": list(topics), "types": list(types)}
+            response = {
+                "op": "service_response",
+                "service": message.get("service"),
+                "values": values,
+                "result": True,
+            }
+            if "id" in message:
+                response["id"] = message["id"]
+            self._send_json(response)
+
+    def _publish_loop(self):
+        interval = 1.0 / self.server.rate
+        last_sent = {}
+        while not self.closed.is_set():
+            with self.subs_lock:
+                topics = list(self.subscriptions.items())
+            try:
+                for topic, throttle in topics:
+                    payload = self.server.payloads.get(topic)
+                    now = time.monotonic()
+                    # rosbridge と同様に throttle_rate より短い間隔では送らない
+                    if payload is None or now - last_sent.get(topic, 0.0) < throttle:
+                        continue
+                    self._send_frame(0x1, payload)
+                    last_sent[topic] = now
+            except OSError:
+                self.closed.set()
+                break
+            time.sleep(interval)
+
+
+class MockRosbridge(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9090, rate: float = 15.0,
+                 width: int = 640, height: int = 480, service_latency: float = 0.005):
+        super().__init__((host, port), RosbridgeHandler)
+        self.rate = rate
+        self.service_latency = service_latency
+
+        image_msg = make_image_msg(width, height)
+        messages = {
+            "/kachaka/front_camera/image_raw": image_msg,
+            "/kachaka/back_camera/image_raw": image_msg,
+            "/kachaka/joint_states": make_jointstate_msg(),
+        }
+        # 毎回シリアライズしないよう、publish するフレームはあらかじめ作っておく
+        self.payloads = {
+            topic: self._publish_payload(topic, msg) for topic, msg in messages.items()
+        }
+        self.latched_payloads = {
+            "/kachaka/layout/locations/list": self._publish_payload(
+                "/kachaka/layout/locations/list", make_locations_msg()
+            ),
+        }
+
+    @staticmethod
+    def _publish_payload(topic: str, msg: dict) -> bytes:
+        return json.dumps({"op": "publish", "topic": topic, "msg": msg}).encode("utf-8")
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock rosbridge server for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--rate", type=float, default=15.0, help="publish rate per topic (Hz)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    server = MockRosbridge(args.host, args.port, args.rate, args.width, args.height)
+    print(f"[MockRosbridge] Listening on ws://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from typing import List, Any, Optional
 from pathlib import Path
 import json
+import os
 from utils.websocket_manager import WebSocketManager
+from utils.shared_websocket_manager import SharedWebSocketManager
+from utils.session_scheduler import SessionScheduler
+from utils.image_worker_pool import ImageWorkerPool
 from msgs.geometry_msgs import Twist
 from msgs.sensor_msgs import Image, JointState
 
@@ -10,26 +14,51 @@ import base64
 from io import BytesIO
 import cv2
 
-LOCAL_IP = "127.0.0.1"  # Replace with your local IP address
-ROSBRIDGE_IP = "127.0.0.1"  # Replace with your rosbridge server IP address
-ROSBRIDGE_PORT = 9090
+LOCAL_IP = os.environ.get("LOCAL_IP", "127.0.0.1")  # Replace with your local IP address
+ROSBRIDGE_IP = os.environ.get("ROSBRIDGE_IP", "127.0.0.1")  # Replace with your rosbridge server IP address
+ROSBRIDGE_PORT = int(os.environ.get("ROSBRIDGE_PORT", 9090))
+IMAGE_WORKER_PROCESSES = int(os.environ.get("IMAGE_WORKER_PROCESSES", 0))  # 画像圧縮用のワーカープロセス数（0で無効、同一プロセスで圧縮）
 
-mcp = FastMCP("ros-mcp-server")
-ws_manager = WebSocketManager(ROSBRIDGE_IP, ROSBRIDGE_PORT, LOCAL_IP)
+# "stdio" 以外（"sse" / "streamable-http"）では常駐サーバーとして動作し、
+# 全セッションでrosbridge接続・トピックキャッシュ・最新フレームを共有する
+MCP_TRANSPORTS = ("stdio", "sse", "streamable-http")
+MCP_TRANSPORT = os.environ.get("MCP_TRANSPORT", "stdio")
+# 認証なしでロボットを動かせるので、既定ではローカルからの接続のみ受け付ける
+MCP_HOST = os.environ.get("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.environ.get("MCP_PORT", 8000))
+MAX_CONCURRENCY_PER_SESSION = int(os.environ.get("MAX_CONCURRENCY_PER_SESSION", 4))  # セッションごとの同時実行ツール数
+
+if MCP_TRANSPORT not in MCP_TRANSPORTS:
+    raise SystemExit(
+        f"Invalid MCP_TRANSPORT: {MCP_TRANSPORT!r} (expected one of {', '.join(MCP_TRANSPORTS)})"
+    )
+SHARED_MODE = MCP_TRANSPORT != "stdio"
+
+mcp = FastMCP("ros-mcp-server", host=MCP_HOST, port=MCP_PORT)
+if SHARED_MODE:
+    ws_manager = SharedWebSocketManager(ROSBRIDGE_IP, ROSBRIDGE_PORT, LOCAL_IP)
+    scheduler = SessionScheduler(MAX_CONCURRENCY_PER_SESSION)
+else:
+    # stdio では接続を呼び出しごとに開閉するので、ツールは1つずつ実行する
+    ws_manager = WebSocketManager(ROSBRIDGE_IP, ROSBRIDGE_PORT, LOCAL_IP)
+    scheduler = SessionScheduler(max_concurrency_per_session=1)
+# ワーカーは spawn で起動する。生成時には起動せず、__main__ の start() か最初の圧縮依頼で起動する
+image_worker_pool = ImageWorkerPool(IMAGE_WORKER_PROCESSES) if IMAGE_WORKER_PROCESSES > 0 else None
 
 #twist = Twist(ws_manager, topic="/cmd_vel")
 #image = Image(ws_manager, topic="/camera/image_raw")
 #jointstate = JointState(ws_manager, topic="/joint_states")
 
 twist = Twist(ws_manager, topic="/kachaka/manual_control/cmd_vel")
-front_camera = Image(ws_manager, topic="/kachaka/front_camera/image_raw")
-back_camera = Image(ws_manager, topic="/kachaka/back_camera/image_raw")
+front_camera = Image(ws_manager, topic="/kachaka/front_camera/image_raw", worker_pool=image_worker_pool)
+back_camera = Image(ws_manager, topic="/kachaka/back_camera/image_raw", worker_pool=image_worker_pool)
 jointstate = JointState(ws_manager, topic="/kachaka/joint_states")
 
 @mcp.tool()
+@scheduler.scheduled()
 def get_topics():
     topic_info = ws_manager.get_topics()
-    ws_manager.close()
+    ws_manager.release()
 
     if topic_info:
         topics, types = zip(*topic_info)
@@ -41,9 +70,10 @@ def get_topics():
         return "No topics found"
 
 @mcp.tool()
+@scheduler.scheduled(motion=True)
 def pub_twist(linear: List[Any], angular: List[Any]):
     msg = twist.publish(linear, angular)
-    ws_manager.close()
+    ws_manager.release()
     
     if msg is not None:
         return "Twist message published successfully"
@@ -51,16 +81,18 @@ def pub_twist(linear: List[Any], angular: List[Any]):
         return "No message published"
 
 @mcp.tool()
+@scheduler.scheduled(motion=True)
 def pub_twist_seq(linear: List[Any], angular: List[Any], duration: List[Any]):
     twist.publish_sequence(linear, angular, duration)
-    ws_manager.close()
+    ws_manager.release()
     return "Twist sequence message published successfully"
 
 @mcp.tool()
+@scheduler.scheduled()
 def sub_front_camera():
     """Kachakaのフロントカメラ画像を取得"""
     msg = front_camera.subscribe()
-    ws_manager.close()
+    ws_manager.release()
     
     if msg is not None:
         return "フロントカメラ画像を正常に取得・保存しました"
@@ -68,10 +100,11 @@ def sub_front_camera():
         return "カメラ画像の取得に失敗しました"
 
 @mcp.tool()
+@scheduler.scheduled()
 def sub_back_camera():
     """Kachakaのバックカメラ画像を取得"""
     msg = back_camera.subscribe()
-    ws_manager.close()
+    ws_manager.release()
     
     if msg is not None:
         return "バックカメラ画像を正常に取得・保存しました"
@@ -83,7 +116,7 @@ def sub_back_camera():
 def get_locations():
     """Kachakaの登録場所リストを取得"""
     data = ws_manager.subscribe_once("/kachaka/layout/locations/list", timeout=3.0)
-    ws_manager.close()
+    ws_manager.release()
     
     if data and "msg" in data:
         locations = data["msg"]["locations"]
@@ -102,7 +135,7 @@ def get_locations():
 def get_battery_state():
     """Kachakaのバッテリー状態を取得"""
     data = ws_manager.subscribe_once("/kachaka/robot_info/battery_state", timeout=3.0)
-    ws_manager.close()
+    ws_manager.release()
     
     if data and "msg" in data:
         return {
@@ -138,11 +171,12 @@ def move_to_location(x: float, y: float, theta: float):
     }
     ws_manager.connect()
     ws_manager.send(msg)
-    ws_manager.close()
+    ws_manager.release()
     return f"座標 ({x}, {y}) への移動コマンドを送信しました"
 '''
 
 @mcp.tool()
+@scheduler.scheduled()
 def get_camera_image_base64(camera_type: str = "front", max_size_kb: int = 700):
     """カメラ画像をBase64形式で取得（Claude Desktopで表示可能）
     
@@ -154,7 +188,7 @@ def get_camera_image_base64(camera_type: str = "front", max_size_kb: int = 700):
     
     # Base64形式で画像を取得
     result = camera.subscribe_as_base64(max_size_kb=max_size_kb)
-    ws_manager.close()
+    ws_manager.release()
     
     if result:
         return {
@@ -169,6 +203,7 @@ def get_camera_image_base64(camera_type: str = "front", max_size_kb: int = 700):
         }
 
 @mcp.tool()
+@scheduler.scheduled()
 def get_both_cameras_base64(max_size_kb: int = 400):
     """前後両方のカメラ画像を取得
     
@@ -177,17 +212,21 @@ def get_both_cameras_base64(max_size_kb: int = 400):
     """
     results = {}
     
+    # 両カメラの圧縮を先に依頼してから待つ（ワーカープールがあれば並列に圧縮される）
+    front_future = front_camera.submit_as_base64(max_size_kb=max_size_kb)
+    back_future = back_camera.submit_as_base64(max_size_kb=max_size_kb)
+
     # フロントカメラ
-    front_result = front_camera.subscribe_as_base64(max_size_kb=max_size_kb)
+    front_result = front_camera.wait_base64(front_future)
     if front_result:
         results["front"] = front_result
     
     # バックカメラ
-    back_result = back_camera.subscribe_as_base64(max_size_kb=max_size_kb)
+    back_result = back_camera.wait_base64(back_future)
     if back_result:
         results["back"] = back_result
     
-    ws_manager.close()
+    ws_manager.release()
     
     if results:
         return {
@@ -200,11 +239,33 @@ def get_both_cameras_base64(max_size_kb: int = 400):
             "message": "カメラ画像の取得に失敗しました"
         }
 
+@mcp.tool()
+def get_image_worker_stats():
+    """画像ワーカープールのキュー長とワーカーごとの稼働率を取得"""
+    if image_worker_pool is None:
+        return {
+            "status": "disabled",
+            "message": "画像ワーカープールは無効です（IMAGE_WORKER_PROCESSES = 0）"
+        }
+    return {
+        "status": "success",
+        **image_worker_pool.stats()
+    }
+
+@mcp.tool()
+def get_server_stats(ctx: Context):
+    """セッションごとの実行中・待機中のツール呼び出し数を取得"""
+    return {
+        "status": "success",
+        "transport": MCP_TRANSPORT,
+        **scheduler.stats(current_session=ctx.session)
+    }
+
 '''
 @mcp.tool()
 def sub_image():
     msg = image.subscribe()
-    ws_manager.close()
+    ws_manager.release()
     
     if msg is not None:
         return "Image data received and downloaded successfully"
@@ -214,7 +275,7 @@ def sub_image():
 @mcp.tool()
 def pub_jointstate(name: list[str], position: list[float], velocity: list[float], effort: list[float]):
     msg = jointstate.publish(name, position, velocity, effort)
-    ws_manager.close()
+    ws_manager.release()
     if msg is not None:
         return "JointState message published successfully"
     else:
@@ -223,7 +284,7 @@ def pub_jointstate(name: list[str], position: list[float], velocity: list[float]
 @mcp.tool()
 def sub_jointstate():
     msg = jointstate.subscribe()
-    ws_manager.close()
+    ws_manager.release()
     if msg is not None:
         return msg
     else:
@@ -231,4 +292,12 @@ def sub_jointstate():
 '''
 
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
+    if image_worker_pool is not None:
+        image_worker_pool.start()
+    try:
+        mcp.run(transport=MCP_TRANSPORT)
+    finally:
+        if SHARED_MODE:
+            ws_manager.close()
+        if image_worker_pool is not None:
+            image_worker_pool.shutdown()
@@ -0,0 +1,151 @@
+import os
+import time
+from concurrent.futures import CancelledError
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import utils.image_worker_pool as image_worker_pool
+from utils.image_worker_pool import ImageWorkerPool
+
+
+# ワーカー側で import できるよう、ジョブの関数はモジュールレベルに置く
+def total(img):
+    return int(img.sum())
+
+
+def slow_total(img, seconds):
+    time.sleep(seconds)
+    return int(img.sum())
+
+
+def crash(img):
+    os._exit(3)
+
+
+def exit_at_startup(conn):
+    os._exit(1)
+
+
+def shm_exists(name: str) -> bool:
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+def job_shm_names(pool: ImageWorkerPool) -> list:
+    with pool._lock:
+        return [job.shm.name for job in pool._jobs.values()]
+
+
+@pytest.fixture
+def pool():
+    pool = ImageWorkerPool(1, restart_backoff=0.1)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def img():
+    return np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+
+
+def test_submit_returns_result(pool, img):
+    assert pool.submit(total, img).result(10) == int(img.sum())
+    stats = pool.stats()
+    assert stats["jobs_done"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_workers_start_lazily():
+    pool = ImageWorkerPool(1)
+    try:
+        assert pool.stats()["started"] is False
+    finally:
+        pool.shutdown()
+
+
+def test_cancel_queued_job_releases_shared_memory(pool, img):
+    running = pool.submit(slow_total, img, 0.5)
+    queued = pool.submit(total, img)
+    running_name, queued_name = job_shm_names(pool)
+    assert pool.stats()["queue_depth"] == 1
+
+    assert queued.cancel()
+    assert not shm_exists(queued_name)
+    assert pool.stats()["queue_depth"] == 0
+
+    assert running.result(10) == int(img.sum())
+    assert not shm_exists(running_name)
+
+
+def test_abandoned_running_job_is_released_on_completion(pool, img):
+    future = pool.submit(slow_total, img, 0.3)
+    [name] = job_shm_names(pool)
+    time.sleep(0.1)  # ワーカーに渡るのを待つ
+    future.cancel()
+
+    with pytest.raises(CancelledError):
+        future.result()
+    deadline = time.monotonic() + 5
+    while shm_exists(name) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not shm_exists(name)
+
+
+def test_worker_death_fails_job_releases_memory_and_restarts(pool, img):
+    future = pool.submit(crash, img)
+    [name] = job_shm_names(pool)
+
+    with pytest.raises(RuntimeError, match="worker died"):
+        future.result(10)
+    assert not shm_exists(name)
+
+    # 再起動後のワーカーで処理が続けられる
+    assert pool.submit(total, img).result(10) == int(img.sum())
+    [worker] = pool.stats()["workers"]
+    assert worker["restarts"] == 1
+    assert worker["state"] == "running"
+
+
+def test_shutdown_fails_pending_jobs_and_releases_memory(img):
+    pool = ImageWorkerPool(1)
+    running = pool.submit(slow_total, img, 0.3)
+    queued = pool.submit(total, img)
+    names = job_shm_names(pool)
+
+    pool.shutdown()
+
+    with pytest.raises(RuntimeError, match="shut down"):
+        queued.result(0)
+    assert running.done()
+    assert not any(shm_exists(name) for name in names)
+    with pytest.raises(RuntimeError):
+        pool.submit(total, img)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_worker_failing_at_startup_is_given_up(monkeypatch, img):
+    # fork なら差し替えた本体がそのまま子プロセスで使われる
+    monkeypatch.setattr(image_worker_pool, "_worker_main", exit_at_startup)
+    pool = ImageWorkerPool(1, start_method="fork", max_restarts=2, restart_backoff=0.05)
+    try:
+        future = pool.submit(total, img)
+        with pytest.raises(RuntimeError):
+            future.result(10)
+
+        deadline = time.monotonic() + 5
+        while pool.stats()["workers"][0]["state"] != "dead" and time.monotonic() < deadline:
+            time.sleep(0.05)
+        [worker] = pool.stats()["workers"]
+        assert worker["state"] == "dead"
+        assert worker["restarts"] == 2
+
+        with pytest.raises(RuntimeError, match="no workers left"):
+            pool.submit(total, img)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,186 @@
+import inspect
+import threading
+import typing
+
+import anyio
+import pytest
+from mcp.server.fastmcp import Context
+
+from utils.session_scheduler import FairMotionLock, SessionScheduler
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSession:
+    pass
+
+
+class FakeContext:
+    def __init__(self, session):
+        self.session = session
+
+
+async def wait_until(predicate, timeout: float = 5.0):
+    with anyio.fail_after(timeout):
+        while not predicate():
+            await anyio.sleep(0.01)
+
+
+async def test_motion_lock_round_robin_between_sessions():
+    lock = FairMotionLock()
+    order = []
+
+    async def command(session, name):
+        await lock.acquire(session)
+        order.append(name)
+        lock.release()
+
+    await lock.acquire("holder")
+    async with anyio.create_task_group() as tg:
+        commands = [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]
+        for queued, (session, name) in enumerate(commands, start=1):
+            tg.start_soon(command, session, name)
+            await wait_until(lambda: lock.waiting == queued)
+        assert lock.waiting_for("a") == 3
+        lock.release()
+
+    # セッション a が先に3つ積んでいても、b の1つ目は a の2つ目より先に実行される
+    assert order == ["a1", "b1", "a2", "a3"]
+    assert lock.waiting == 0
+
+
+async def test_motion_lock_cancelled_waiter_leaves_queue():
+    lock = FairMotionLock()
+    acquired = []
+
+    async def command(session, scope=None):
+        with scope or anyio.CancelScope():
+            await lock.acquire(session)
+            acquired.append(session)
+            lock.release()
+
+    await lock.acquire("holder")
+    scope = anyio.CancelScope()
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(command, "a", scope)
+        await wait_until(lambda: lock.waiting == 1)
+        tg.start_soon(command, "b")
+        await wait_until(lambda: lock.waiting == 2)
+
+        scope.cancel()
+        await wait_until(lambda: lock.waiting == 1)
+        assert lock.waiting_for("a") == 0
+        lock.release()
+
+    assert acquired == ["b"]
+    assert lock.waiting == 0
+
+
+async def test_motion_lock_passes_on_when_cancelled_after_hand_off():
+    lock = FairMotionLock()
+    acquired = []
+
+    async def command(session, scope=None):
+        with scope or anyio.CancelScope():
+            await lock.acquire(session)
+            acquired.append(session)
+            lock.release()
+
+    await lock.acquire("holder")
+    scope = anyio.CancelScope()
+    # 実行権が次へ渡らなければ b が待ち続けるので、時間で打ち切る
+    with anyio.fail_after(5):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(command, "a", scope)
+            await wait_until(lambda: lock.waiting == 1)
+            tg.start_soon(command, "b")
+            await wait_until(lambda: lock.waiting == 2)
+
+            # a のキャンセルが届いた後、a が動き出す前に実行権が a に渡る
+            scope.cancel()
+            lock.release()
+
+    assert acquired == ["b"]
+    # 実行権は b に渡り、最後に解放されている
+    await lock.acquire("c")
+    lock.release()
+
+
+async def test_scheduler_limits_calls_per_session():
+    scheduler = SessionScheduler(max_concurrency_per_session=2)
+    busy = FakeContext(FakeSession())
+    other = FakeContext(FakeSession())
+    release = threading.Event()
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def blocking_call():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.pop()
+        return "done"
+
+    results = []
+
+    async def run(ctx, func):
+        results.append(await scheduler.run(ctx, func))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(5):
+            tg.start_soon(run, busy, blocking_call)
+        await wait_until(lambda: scheduler.stats()["waiting_calls"] == 3)
+
+        # 他のセッションは待たされない
+        with anyio.fail_after(5):
+            assert await scheduler.run(other, lambda: "other") == "other"
+
+        stats = scheduler.stats(current_session=busy.session)
+        [session_stats] = [s for s in stats["sessions"] if s["current"]]
+        assert session_stats["active_calls"] == 2
+        assert session_stats["waiting_calls"] == 3
+        assert stats["active_calls"] == 2
+
+        release.set()
+
+    assert results == ["done"] * 5
+    assert max(peak) == 2
+    assert scheduler.stats()["active_calls"] == 0
+
+
+async def test_scheduler_serializes_motion_across_sessions():
+    scheduler = SessionScheduler(max_concurrency_per_session=4)
+    running = []
+    overlaps = []
+
+    def motion():
+        running.append(1)
+        overlaps.append(len(running))
+        threading.Event().wait(0.05)
+        running.pop()
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(3):
+            ctx = FakeContext(FakeSession())
+            for _ in range(2):
+                tg.start_soon(lambda c=ctx: scheduler.run(c, motion, motion=True))
+
+    assert len(overlaps) == 6
+    assert max(overlaps) == 1
+
+
+async def test_scheduled_adds_ctx_without_changing_tool():
+    scheduler = SessionScheduler()
+
+    def tool(camera_type: str, max_size_kb: int = 200):
+        return camera_type, max_size_kb
+
+    wrapper = scheduler.scheduled()(tool)
+
+    assert list(inspect.signature(wrapper).parameters) == ["camera_type", "max_size_kb", "ctx"]
+    assert typing.get_type_hints(wrapper)["ctx"] is Context
+    assert "ctx" not in typing.get_type_hints(tool)
+    assert await wrapper("front", ctx=FakeContext(FakeSession())) == ("front", 200)
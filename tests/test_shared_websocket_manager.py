@@ -0,0 +1,102 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from mock_rosbridge import MockRosbridge
+from utils.shared_websocket_manager import SharedWebSocketManager
+
+LATCHED_TOPIC = "/kachaka/layout/locations/list"
+CAMERA_TOPIC = "/kachaka/front_camera/image_raw"
+
+
+@pytest.fixture
+def rosbridge():
+    server = MockRosbridge(port=0, width=32, height=24, service_latency=0.01)
+    server.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(rosbridge):
+    port = rosbridge.server_address[1]
+    manager = SharedWebSocketManager("127.0.0.1", port, "127.0.0.1", frame_max_age=0.3)
+    yield manager
+    manager.close()
+
+
+def test_concurrent_service_calls_get_their_own_response(manager):
+    results = {}
+
+    def call(index):
+        results[index] = manager.call_service(f"/test/service_{index}")
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(results) == 20
+    for index, response in results.items():
+        assert response["service"] == f"/test/service_{index}"
+        assert f"/test/service_{index}:" in response["id"]
+    # 待っていない id の応答は保持しない
+    assert manager._responses == {}
+    assert manager._waiting == set()
+
+
+def test_get_topics_uses_shared_connection(manager):
+    topics = dict(manager.get_topics())
+    assert topics[CAMERA_TOPIC] == "sensor_msgs/Image"
+
+
+def test_receive_binary_returns_fresh_frame(manager):
+    manager.send({"op": "subscribe", "topic": CAMERA_TOPIC})
+    raw = manager.receive_binary(CAMERA_TOPIC)
+    assert json.loads(raw)["topic"] == CAMERA_TOPIC
+
+
+def test_subscribe_once_returns_latched_message_after_max_age(manager):
+    first = manager.subscribe_once(LATCHED_TOPIC)
+    assert first["msg"]["locations"][0]["name"] == "Kitchen"
+
+    # latched トピックは購読時に一度しか届かないが、古くなっても返せる
+    time.sleep(manager.frame_max_age * 2)
+    assert manager.subscribe_once(LATCHED_TOPIC, timeout=0.5) == first
+
+    # 画像と同じ受信経路では古いメッセージは使わない
+    manager.receive_timeout = 0.2
+    assert manager.receive_binary(LATCHED_TOPIC) == b""
+
+
+def test_receive_with_timeout_does_not_read_socket(manager):
+    assert manager.receive_with_timeout(0.1) is None
+
+    manager.send({"op": "subscribe", "topic": CAMERA_TOPIC})
+    raw = manager.receive_with_timeout(2.0, topic=CAMERA_TOPIC)
+    assert json.loads(raw)["topic"] == CAMERA_TOPIC
+    # 受信スレッドは動き続け、サービス応答も届く
+    assert manager.get_topics()
+
+
+def test_call_service_is_bounded_when_rosbridge_does_not_answer():
+    # 接続は受け付けるが WebSocket ハンドシェイクに応答しないサーバー
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    port = listener.getsockname()[1]
+    manager = SharedWebSocketManager(
+        "127.0.0.1", port, "127.0.0.1", receive_timeout=0.5, connect_timeout=0.5
+    )
+    try:
+        started = time.monotonic()
+        assert manager.call_service("/rosapi/topics") is None
+        assert time.monotonic() - started < 2.0
+    finally:
+        manager.close()
+        listener.close()
@@ -0,0 +1,389 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import wait
+from concurrent.futures import Future, InvalidStateError
+from typing import Callable, Optional
+
+import numpy as np
+
+
+def _worker_main(conn):
+    """ワーカープロセス本体：共有メモリ上のフレームを処理して結果だけを返す"""
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        job_id, func, shm_name, shape, dtype, args = task
+        started = time.perf_counter()
+        result, error = None, None
+        shm = None
+        img = None
+        try:
+            # ピクセルバッファはコピー・pickleせず共有メモリをそのまま参照
+            shm = shared_memory.SharedMemory(name=shm_name)
+            img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            result = func(img, *args)
+        except Exception as e:
+            error = repr(e)
+        finally:
+            img = None  # close() 前にバッファ参照を解放
+            if shm is not None:
+                shm.close()
+
+        elapsed = time.perf_counter() - started
+        conn.send((job_id, elapsed, result, error))
+
+
+class _Job:
+    def __init__(self, future: Future, shm: shared_memory.SharedMemory, task: tuple):
+        self.future = future
+        self.shm = shm
+        self.task = task
+
+
+class _Worker:
+    def __init__(self, name: str, process, conn):
+        self.name = name
+        self.process = process
+        self.conn = conn
+        self.job_id = None  # 処理中のジョブ
+        self.job_started = 0.0
+        self.spawned_at = time.monotonic()
+
+
+class ImageWorkerPool:
+    """画像のリサイズ・JPEG圧縮・Base64化を別プロセスで実行するワーカープール
+
+    フレームは multiprocessing.shared_memory 経由で渡し、
+    ワーカーからは圧縮済みの結果（dict など）だけを受け取る。
+
+    ワーカーは既定で "spawn" で起動する。全OSで使え、親プロセスで
+    スレッド（rosbridge受信やツール実行）が動いていても安全に起動できるため。
+    spawn の子プロセスはメインモジュールを import し直すので、
+    ワーカーは生成時ではなく start() か最初の submit() で起動する。
+
+    落ちたワーカーは restart_backoff 秒から倍々に間隔をあけて再起動し、
+    ジョブを1つも完了せずに max_restarts 回続けて落ちたら再起動をあきらめる。
+    """
+
+    # これより長く動いていたワーカーは正常に起動できていたとみなし、連続失敗数を数え直す
+    HEALTHY_UPTIME = 30.0
+
+    def __init__(self, num_workers: Optional[int] = None, start_method: str = "spawn",
+                 max_restarts: int = 5, restart_backoff: float = 0.5,
+                 max_restart_backoff: float = 30.0):
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.start_method = start_method
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+
+        self._ctx = mp.get_context(start_method)
+        self._lock = threading.Lock()
+        self._workers = []
+        self._jobs = {}  # job_id -> _Job
+        self._backlog = deque()  # ワーカーの空き待ちの job_id
+        self._busy_time = [0.0] * self.num_workers
+        self._jobs_done = [0] * self.num_workers
+        self._restarts = [0] * self.num_workers
+        self._failures = [0] * self.num_workers  # ジョブを完了せずに落ちた連続回数
+        self._restart_at = [None] * self.num_workers  # 再起動予定時刻
+        self._gave_up = [False] * self.num_workers
+        self._jobs_failed = 0
+        self._started_at = None
+        self._collector = None
+        self._closed = False
+
+    def start(self):
+        """ワーカーを起動する（起動済みなら何もしない）"""
+        with self._lock:
+            if self._started_at is not None or self._closed:
+                return
+            if os.name == "posix":
+                # 子プロセスと同じ resource tracker を使い、共有メモリの二重管理を防ぐ
+                resource_tracker.ensure_running()
+            self._workers = [self._spawn_worker(i) for i in range(self.num_workers)]
+            self._started_at = time.monotonic()
+
+        self._collector = threading.Thread(
+            target=self._collect_results, name="image-worker-collector", daemon=True
+        )
+        self._collector.start()
+        print(f"[ImageWorkerPool] Started {self.num_workers} workers ({self.start_method})")
+
+    def _spawn_worker(self, index: int) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name=f"image-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process.name, process, parent_conn)
+
+    def submit(self, func: Callable, img: np.ndarray, *args) -> Future:
+        """img を共有メモリに置き、ワーカーで func(img, *args) を実行する
+
+        func はワーカー側で import できるモジュールレベルの関数であること。
+        返した Future を cancel() すると、未実行なら破棄し、実行中なら結果を捨てる。
+        """
+        if self._closed:
+            raise RuntimeError("ImageWorkerPool is shut down")
+        self.start()
+        if all(self._gave_up):
+            raise RuntimeError("ImageWorkerPool has no workers left (all failed to restart)")
+
+        img = np.ascontiguousarray(img)
+        shm = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+        shared = np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)
+        np.copyto(shared, img)
+        del shared
+
+        job_id = uuid.uuid4().hex
+        future = Future()
+        task = (job_id, func, shm.name, img.shape, img.dtype.str, args)
+        with self._lock:
+            self._jobs[job_id] = _Job(future, shm, task)
+            self._backlog.append(job_id)
+            self._dispatch()
+
+        future.add_done_callback(lambda f: self._forget_if_cancelled(job_id, f))
+        return future
+
+    def _dispatch(self):
+        # self._lock を保持した状態で呼ぶ
+        for worker in self._workers:
+            if not self._backlog:
+                return
+            if worker.job_id is not None or not worker.process.is_alive():
+                continue
+
+            job_id = self._backlog.popleft()
+            try:
+                worker.conn.send(self._jobs[job_id].task)
+            except (OSError, ValueError):
+                # 送信できないワーカーはコレクターが検知して再起動する
+                self._backlog.appendleft(job_id)
+                continue
+            worker.job_id = job_id
+            worker.job_started = time.monotonic()
+
+    def _forget_if_cancelled(self, job_id: str, future: Future):
+        if not future.cancelled():
+            return
+        with self._lock:
+            if job_id not in self._backlog:
+                # 実行中のジョブは完了時に共有メモリを解放する
+                return
+            self._backlog.remove(job_id)
+            job = self._jobs.pop(job_id)
+        self._release(job.shm)
+
+    def _collect_results(self):
+        while not self._closed:
+            with self._lock:
+                workers = list(enumerate(self._workers))
+                restart_times = [t for t in self._restart_at if t is not None]
+                running = [
+                    (i, w) for i, w in workers
+                    if self._restart_at[i] is None and not self._gave_up[i]
+                ]
+
+            timeout = 0.5
+            if restart_times:
+                timeout = min(timeout, max(min(restart_times) - time.monotonic(), 0.0))
+            waitables = [w.conn for _, w in running] + [w.process.sentinel for _, w in running]
+            if waitables:
+                ready = wait(waitables, timeout=timeout)
+            else:
+                ready = []
+                time.sleep(timeout)
+
+            for index, worker in running:
+                if worker.conn in ready:
+                    try:
+                        job_id, elapsed, result, error = worker.conn.recv()
+                    except (EOFError, OSError):
+                        pass  # ワーカーが落ちた。下の生存確認で処理する
+                    else:
+                        self._finish(index, worker, job_id, elapsed, result, error)
+
+                if not worker.process.is_alive() and not self._closed:
+                    self._on_worker_died(index, worker)
+
+            now = time.monotonic()
+            for index, restart_at in enumerate(list(self._restart_at)):
+                if restart_at is not None and restart_at <= now and not self._closed:
+                    self._restart(index)
+
+            with self._lock:
+                self._dispatch()
+
+    def _finish(self, index: int, worker: _Worker, job_id: str, elapsed: float, result, error):
+        with self._lock:
+            worker.job_id = None
+            self._busy_time[index] += elapsed
+            self._jobs_done[index] += 1
+            self._failures[index] = 0
+            if error is not None:
+                self._jobs_failed += 1
+            job = self._jobs.pop(job_id, None)
+            self._dispatch()
+
+        if job is None:
+            return
+        self._release(job.shm)
+        self._resolve(job.future, result, error)
+
+    def _on_worker_died(self, index: int, worker: _Worker):
+        exitcode = worker.process.exitcode
+        now = time.monotonic()
+        orphans = []
+
+        with self._lock:
+            job = self._jobs.pop(worker.job_id, None) if worker.job_id else None
+            if worker.job_id is not None:
+                self._busy_time[index] += now - worker.job_started
+                self._jobs_failed += 1
+                worker.job_id = None
+            worker.conn.close()
+
+            if now - worker.spawned_at >= self.HEALTHY_UPTIME:
+                self._failures[index] = 0
+            self._failures[index] += 1
+            if self._failures[index] > self.max_restarts:
+                self._gave_up[index] = True
+                print(f"[ImageWorkerPool] {worker.name} died (exit code {exitcode}) "
+                      f"{self._failures[index]} times in a row, giving up")
+                if all(self._gave_up):
+                    # 処理できるワーカーが残っていないので、待機中のジョブも失敗させる
+                    orphans = [self._jobs.pop(job_id) for job_id in self._backlog]
+                    self._backlog.clear()
+            else:
+                delay = min(self.restart_backoff * 2 ** (self._failures[index] - 1),
+                            self.max_restart_backoff)
+                self._restart_at[index] = now + delay
+                print(f"[ImageWorkerPool] {worker.name} died (exit code {exitcode}), "
+                      f"restarting in {delay:.1f}s")
+
+        # 落ちたワーカーが処理していたジョブは再投入せず失敗させる（同じ入力で再び落ちうるため）
+        if job is not None:
+            self._release(job.shm)
+            self._resolve(job.future, None, f"worker died (exit code {exitcode})")
+        for orphan in orphans:
+            self._release(orphan.shm)
+            self._resolve(orphan.future, None, "no workers left")
+
+    def _restart(self, index: int):
+        with self._lock:
+            self._restart_at[index] = None
+            self._workers[index] = self._spawn_worker(index)
+            self._restarts[index] += 1
+
+    @staticmethod
+    def _resolve(future: Future, result, error):
+        try:
+            if error is not None:
+                future.set_exception(RuntimeError(f"Image worker failed: {error}"))
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass  # 呼び出し側が待つのをやめて cancel() 済み
+
+    @staticmethod
+    def _release(shm: shared_memory.SharedMemory):
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[ImageWorkerPool] Shared memory release error: {e}")
+
+    def stats(self) -> dict:
+        """キュー長とワーカーごとの稼働率を返す"""
+        if self._started_at is None:
+            return {
+                "num_workers": self.num_workers,
+                "start_method": self.start_method,
+                "started": False,
+            }
+
+        now = time.monotonic()
+        uptime = max(now - self._started_at, 1e-9)
+
+        with self._lock:
+            workers = []
+            for i, worker in enumerate(self._workers):
+                busy = self._busy_time[i]
+                if worker.job_id is not None:
+                    busy += now - worker.job_started
+                if self._gave_up[i]:
+                    state = "dead"
+                elif self._restart_at[i] is not None:
+                    state = "restarting"
+                else:
+                    state = "running"
+                workers.append({
+                    "name": worker.name,
+                    "state": state,
+                    "alive": worker.process.is_alive(),
+                    "busy": worker.job_id is not None,
+                    "jobs_done": self._jobs_done[i],
+                    "restarts": self._restarts[i],
+                    "utilization": round(min(busy / uptime, 1.0), 4),
+                })
+
+            return {
+                "num_workers": self.num_workers,
+                "start_method": self.start_method,
+                "started": True,
+                "queue_depth": len(self._backlog),
+                "in_progress": sum(1 for w in workers if w["busy"]),
+                "jobs_done": sum(self._jobs_done),
+                "jobs_failed": self._jobs_failed,
+                "uptime_sec": round(uptime, 2),
+                "workers": workers,
+            }
+
+    def shutdown(self, timeout: float = 2.0):
+        if self._closed:
+            return
+        self._closed = True
+        if self._collector is not None:
+            self._collector.join(timeout)
+
+        with self._lock:
+            workers = list(self._workers)
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            self._backlog.clear()
+
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+
+        # 未完了ジョブの共有メモリを解放
+        for job in jobs:
+            self._release(job.shm)
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("ImageWorkerPool is shut down"))
+        print("[ImageWorkerPool] Shut down")
@@ -0,0 +1,146 @@
+import functools
+import inspect
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Callable
+
+import anyio
+from mcp.server.fastmcp import Context
+
+
+class FairMotionLock:
+    """モーションコマンド用の排他ロック
+
+    待機中のコマンドはセッションごとのキューに積み、セッション間で
+    ラウンドロビンに実行権を渡す。1つのセッションが大量にコマンドを
+    投げても、他のセッションのコマンドが後回しにされ続けることはない。
+    イベントループ上からのみ呼び出すこと。
+    """
+
+    def __init__(self):
+        self._queues = OrderedDict()  # session -> deque[anyio.Event]
+        self._busy = False
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def waiting_for(self, session_key: Any) -> int:
+        return len(self._queues.get(session_key, ()))
+
+    async def acquire(self, session_key: Any):
+        if not self._busy and not self._queues:
+            self._busy = True
+            return
+
+        event = anyio.Event()
+        self._queues.setdefault(session_key, deque()).append(event)
+        try:
+            await event.wait()
+        except BaseException:
+            if event.is_set():
+                # 実行権を受け取った直後にキャンセルされた場合は次へ渡す
+                self.release()
+            else:
+                queue = self._queues.get(session_key)
+                if queue is not None:
+                    queue.remove(event)
+                    if not queue:
+                        del self._queues[session_key]
+            raise
+
+    def release(self):
+        if not self._queues:
+            self._busy = False
+            return
+
+        # 先頭のセッションに実行権を渡し、まだ待ちがあれば末尾へ回す
+        session_key, queue = self._queues.popitem(last=False)
+        event = queue.popleft()
+        if queue:
+            self._queues[session_key] = queue
+        event.set()
+
+
+class SessionScheduler:
+    """MCPセッションごとの同時実行数制限とモーションコマンドの公平なスケジューリング
+
+    ツールの本体（ブロッキング処理）はワーカースレッドで実行し、
+    イベントループが他のセッションのリクエストを処理し続けられるようにする。
+    """
+
+    def __init__(self, max_concurrency_per_session: int = 4, max_threads: int = 40):
+        self.max_concurrency_per_session = max_concurrency_per_session
+        self.max_threads = max_threads
+        self._limiter = None  # イベントループ上で初回呼び出し時に作成
+        self._session_limits = weakref.WeakKeyDictionary()  # session -> Semaphore
+        self._motion_lock = FairMotionLock()
+
+    def _session_limit(self, session: Any) -> anyio.Semaphore:
+        limit = self._session_limits.get(session)
+        if limit is None:
+            limit = anyio.Semaphore(self.max_concurrency_per_session)
+            self._session_limits[session] = limit
+        return limit
+
+    async def run(self, ctx, func: Callable, *args, motion: bool = False, **kwargs):
+        """func(*args, **kwargs) をセッションの制限内でワーカースレッドで実行する
+
+        motion=True の場合はモーションコマンドとして他と排他し、セッション間で公平に順番を回す。
+        """
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.max_threads)
+        session = ctx.session
+        call = functools.partial(func, *args, **kwargs)
+
+        async with self._session_limit(session):
+            if not motion:
+                return await anyio.to_thread.run_sync(call, limiter=self._limiter)
+
+            await self._motion_lock.acquire(session)
+            try:
+                return await anyio.to_thread.run_sync(call, limiter=self._limiter)
+            finally:
+                self._motion_lock.release()
+
+    def scheduled(self, motion: bool = False):
+        """同期関数のツールを run() 経由で実行する非同期ツールに変換するデコレータ
+
+        @mcp.tool() の内側に付ける。ツールの引数はそのまま、ctx だけが追加される。
+        """
+        def decorator(func: Callable):
+            @functools.wraps(func)
+            async def wrapper(*args, ctx: Context, **kwargs):
+                return await self.run(ctx, func, *args, motion=motion, **kwargs)
+
+            signature = inspect.signature(func)
+            ctx_param = inspect.Parameter("ctx", inspect.Parameter.KEYWORD_ONLY, annotation=Context)
+            wrapper.__signature__ = signature.replace(
+                parameters=[*signature.parameters.values(), ctx_param]
+            )
+            # functools.wraps は元関数の __annotations__ をそのまま共有するので、
+            # 型ヒントから Context を探す SDK にも ctx が見えるよう新しい dict にする
+            wrapper.__annotations__ = {**func.__annotations__, "ctx": Context}
+            return wrapper
+
+        return decorator
+
+    def stats(self, current_session: Any = None) -> dict:
+        """セッションごとの実行中・待機中の呼び出し数を返す"""
+        sessions = []
+        for index, (session, limit) in enumerate(list(self._session_limits.items())):
+            sessions.append({
+                "session": index,
+                "current": session is current_session,
+                "active_calls": self.max_concurrency_per_session - limit.value,
+                "waiting_calls": limit.statistics().tasks_waiting,
+                "motion_waiting": self._motion_lock.waiting_for(session),
+            })
+
+        return {
+            "max_concurrency_per_session": self.max_concurrency_per_session,
+            "active_calls": sum(s["active_calls"] for s in sessions),
+            "waiting_calls": sum(s["waiting_calls"] for s in sessions),
+            "motion_waiting": self._motion_lock.waiting,
+            "sessions": sessions,
+        }
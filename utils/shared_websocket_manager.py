@@ -0,0 +1,294 @@
+import json
+import re
+import time
+import uuid
+import threading
+from typing import Optional
+
+import websocket._core as websocket
+from websocket._exceptions import WebSocketTimeoutException
+
+from utils.websocket_manager import WebSocketManager
+
+# rosbridge の publish メッセージは先頭が op, topic の順になるので、
+# 大きな画像メッセージ全体をパースせずにトピック名を取り出す
+_PUBLISH_PREFIX = re.compile(r'^\{\s*"op"\s*:\s*"publish"\s*,\s*"topic"\s*:\s*"([^"]+)"')
+
+
+class SharedWebSocketManager(WebSocketManager):
+    """複数のMCPセッションで1本のrosbridge接続を共有するWebSocketManager
+
+    受信は専用スレッドで行い、トピックごとの最新メッセージ（最新フレーム）と
+    サービス応答を振り分けて保持する。購読は一度張ったら維持し、
+    他のセッションも同じ最新フレームバッファを参照する。
+    """
+
+    def __init__(self, ip: str, port: int, local_ip: str,
+                 receive_timeout: float = 2.0, frame_max_age: float = 1.0,
+                 topic_cache_ttl: float = 5.0, throttle_rate_ms: int = 200,
+                 connect_timeout: float = 3.0):
+        super().__init__(ip, port, local_ip)
+        self.receive_timeout = receive_timeout
+        self.frame_max_age = frame_max_age
+        self.topic_cache_ttl = topic_cache_ttl
+        self.connect_timeout = connect_timeout
+        # 購読は張りっぱなしになるので、rosbridge 側で送信間隔を間引いて帯域を抑える
+        self.throttle_rate_ms = throttle_rate_ms
+
+        self._conn_lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._subscriptions = {}  # topic -> subscribe メッセージ
+        self._latest = {}  # topic -> (raw, 受信時刻)
+        self._responses = {}  # id -> raw
+        self._waiting = set()  # 応答待ちのサービス呼び出し id
+        self._topic_cache = None  # (取得時刻, [(topic, type), ...])
+        self._reader = None
+        self._stopping = False
+
+    def connect(self):
+        """受信スレッドを起動し、接続できるまで最大 connect_timeout 秒待つ
+
+        接続そのものは受信スレッドがロックの外で行うので、rosbridge が
+        応答しなくなってもツール側のスレッドは詰まらずタイムアウトで戻る。
+        """
+        self._ensure_reader()
+        deadline = time.monotonic() + self.connect_timeout
+        with self._cond:
+            while not self._is_connected() and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                self._cond.wait(remaining)
+
+    def _ensure_reader(self):
+        with self._conn_lock:
+            if self._stopping:
+                return
+            if self._reader is None or not self._reader.is_alive():
+                self._reader = threading.Thread(
+                    target=self._read_loop, name="rosbridge-reader", daemon=True
+                )
+                self._reader.start()
+
+    def _is_connected(self) -> bool:
+        ws = self.ws
+        return ws is not None and ws.connected
+
+    def _open(self) -> bool:
+        try:
+            url = f"ws://{self.ip}:{self.port}"
+            ws = websocket.create_connection(
+                url, timeout=self.connect_timeout, skip_utf8_validation=True
+            )
+            print("[WebSocket] Connected")
+        except Exception as e:
+            print(f"[WebSocket] Connection error: {e}")
+            return False
+
+        with self._conn_lock:
+            if self._stopping:
+                ws.close()
+                return False
+            self.ws = ws
+            # 再接続時は維持している購読を張り直す
+            for message in self._subscriptions.values():
+                self._send_raw(message)
+
+        with self._cond:
+            self._cond.notify_all()
+        return True
+
+    def _send_raw(self, message: dict) -> bool:
+        ws = self.ws
+        if ws is None:
+            if message.get("op") != "subscribe":  # 購読は接続後に張り直される
+                print(f"[WebSocket] Not connected, dropped {message.get('op')} message")
+            return False
+        try:
+            ws.send(json.dumps(message))
+            return True
+        except TypeError as e:
+            print(f"[WebSocket] JSON serialization error: {e}")
+        except Exception as e:
+            print(f"[WebSocket] Send error: {e}")
+            self._drop_connection()
+        return False
+
+    def send(self, message: dict):
+        op = message.get("op")
+        topic = message.get("topic")
+
+        if op == "subscribe":
+            with self._conn_lock:
+                if topic in self._subscriptions:
+                    return
+                message = {
+                    "throttle_rate": self.throttle_rate_ms,
+                    "queue_length": 1,
+                    **message,
+                }
+                self._subscriptions[topic] = message
+        elif op == "unsubscribe":
+            # 他のセッションも最新フレームを使うので購読は維持する
+            return
+
+        self.connect()
+        self._send_raw(message)
+
+    def _read_loop(self):
+        while not self._stopping:
+            ws = self.ws
+            if ws is None or not ws.connected:
+                if not self._open():
+                    # 接続できなければ間隔をあけて再接続を試みる
+                    time.sleep(1.0)
+                continue
+
+            try:
+                ws.settimeout(1.0)
+                raw = ws.recv()
+            except WebSocketTimeoutException:
+                continue
+            except Exception as e:
+                if not self._stopping:
+                    print(f"[WebSocket] Receive error: {e}")
+                    self._drop_connection()
+                continue
+
+            if not raw:
+                continue
+            self._dispatch(raw)
+
+    def _dispatch(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+
+        match = _PUBLISH_PREFIX.match(raw[:512])
+        if match:
+            data = {"op": "publish", "topic": match.group(1)}
+        else:
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError as e:
+                print(f"[WebSocket] JSON decode error: {e}")
+                return
+
+        with self._cond:
+            if data.get("op") == "publish" and "topic" in data:
+                self._latest[data["topic"]] = (raw, time.monotonic())
+            elif data.get("op") == "service_response" and data.get("id") in self._waiting:
+                self._responses[data["id"]] = raw
+            self._cond.notify_all()
+
+    def _drop_connection(self):
+        with self._conn_lock:
+            ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def receive_binary(self, topic: Optional[str] = None) -> bytes:
+        """topic の最新メッセージを返す（frame_max_age より古ければ新着を待つ）"""
+        if topic is None:
+            print("[WebSocket] Shared connection requires a topic to receive")
+            return b""
+        return self._wait_latest(topic, self.receive_timeout, self.frame_max_age)
+
+    def receive_with_timeout(self, timeout=2.0, topic: Optional[str] = None):
+        """topic の最新メッセージを最大 timeout 秒待って返す
+
+        ソケットからの受信は受信スレッドだけが行う。ここで直接 recv() すると
+        他のセッション宛てのフレームやサービス応答を横取りしてしまう。
+        """
+        if topic is None:
+            print("[WebSocket] Shared connection requires a topic to receive")
+            return None
+        return self._wait_latest(topic, timeout, self.frame_max_age) or None
+
+    def _wait_latest(self, topic: str, timeout: float, max_age: Optional[float] = None):
+        """topic の保持しているメッセージを返す
+
+        max_age を指定した場合はそれより古いメッセージを使わず新着を待つ。
+        """
+        self._ensure_reader()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                latest = self._latest.get(topic)
+                now = time.monotonic()
+                if latest is not None and (max_age is None or now - latest[1] <= max_age):
+                    return latest[0]
+                if now >= deadline:
+                    return b""
+                self._cond.wait(deadline - now)
+
+    def call_service(self, service: str, args: Optional[dict] = None,
+                     timeout: Optional[float] = None) -> Optional[dict]:
+        """サービスを呼び出し、同じ id の応答を待って返す"""
+        request_id = f"call_service:{service}:{uuid.uuid4().hex}"
+        message = {"op": "call_service", "service": service, "id": request_id}
+        if args is not None:
+            message["args"] = args
+
+        with self._cond:
+            self._waiting.add(request_id)
+        self.connect()
+        if not self._send_raw(message):
+            with self._cond:
+                self._waiting.discard(request_id)
+            return None
+
+        deadline = time.monotonic() + (timeout or self.receive_timeout)
+        with self._cond:
+            try:
+                while request_id not in self._responses:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        print(f"[WebSocket] Service call timed out: {service}")
+                        return None
+                    self._cond.wait(remaining)
+                raw = self._responses.pop(request_id)
+            finally:
+                self._waiting.discard(request_id)
+        return json.loads(raw)
+
+    def get_topics(self) -> list[tuple[str, str]]:
+        cached = self._topic_cache
+        if cached is not None and time.monotonic() - cached[0] <= self.topic_cache_ttl:
+            return cached[1]
+
+        data = self.call_service("/rosapi/topics")
+        if data and "values" in data:
+            topics = data["values"].get("topics", [])
+            types = data["values"].get("types", [])
+            if topics and types and len(topics) == len(types):
+                topic_info = list(zip(topics, types))
+                self._topic_cache = (time.monotonic(), topic_info)
+                return topic_info
+            print("[WebSocket] Mismatch in topics and types length")
+        return []
+
+    def subscribe_once(self, topic, timeout=2.0):
+        """トピックの最後に受信したメッセージを取得（共有の最新フレームバッファを使用）
+
+        購読は維持され、latched トピックは購読時に一度しか届かないので、
+        受信時刻に関係なく保持しているメッセージを返す。
+        """
+        self.send({"op": "subscribe", "topic": topic})
+        raw = self._wait_latest(topic, timeout)
+        if raw:
+            return json.loads(raw)
+        return None
+
+    def release(self):
+        # 接続は全セッションで共有するので、ツール呼び出しごとには閉じない
+        pass
+
+    def close(self):
+        self._stopping = True
+        self._drop_connection()
+        if self._reader is not None:
+            self._reader.join(2.0)
+        print("[WebSocket] Closed")
@@ -2,6 +2,7 @@ import socket
 import json
 import websocket._core as websocket
 import base64
+from typing import Optional
 
 class WebSocketManager:
     def __init__(self, ip: str, port: int, local_ip: str):
@@ -15,7 +16,8 @@ class WebSocketManager:
             try:
                 # Use websocket.create_connection instead of manual socket management
                 url = f"ws://{self.ip}:{self.port}"
-                self.ws = websocket.create_connection(url)
+                # 画像などの大きなテキストフレームでは純Pythonの UTF-8 検証が重いので省略する
+                self.ws = websocket.create_connection(url, skip_utf8_validation=True)
                 print("[WebSocket] Connected")
             except Exception as e:
                 print(f"[WebSocket] Connection error: {e}")
@@ -36,7 +38,8 @@ class WebSocketManager:
                 self.close()
 
 
-    def receive_binary(self) -> bytes:
+    def receive_binary(self, topic: Optional[str] = None) -> bytes:
+        # topic は共有接続（SharedWebSocketManager）での振り分け用。ここでは次の受信をそのまま返す
         self.connect()
         if self.ws:
             try:
@@ -73,6 +76,10 @@ class WebSocketManager:
                 print(f"[WebSocket] Error: {e}")
         return []
 
+    def release(self):
+        """ツール呼び出しの終了時に呼ぶ。単独接続ではそのまま切断する"""
+        self.close()
+
     def close(self):
         if self.ws and self.ws.connected:
             try: